@@ -1,86 +1,240 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
 import numpy as np
-import requests
-import plotly.graph_objects as go
 from datetime import date, timedelta
 import time
 import calendar
+import functools
+import hashlib
+import hmac
+import logging
+import os
+import pickle
+import sqlite3
+import tempfile
+import uuid
+import zlib
+from collections.abc import Iterable, Iterator
 
 # =========================================================
 # 1) CONFIGURAÇÃO DA PÁGINA
 # =========================================================
 st.set_page_config(page_title="Simulador de Patrimônio", layout="wide")
 
-st.markdown(
+# CSS servido como arquivo estático (server.enableStaticServing em .streamlit/config.toml):
+# o navegador baixa uma vez e revalida por ETag, em vez de receber o bloco inline a cada sessão.
+st.markdown('<link rel="stylesheet" href="app/static/estilo.css">', unsafe_allow_html=True)
+
+# =========================================================
+# 1.1) CACHE COMPARTILHADO ENTRE RÉPLICAS (opcional)
+# =========================================================
+# st.cache_data continua sendo o cache L1 (memória do processo).
+# Se SIMULADOR_CACHE_URL estiver definido, os loaders também consultam um
+# store local compartilhado (L2), visível por todas as réplicas:
+#   - sqlite:////caminho/cache.db  (arquivo SQLite em modo WAL)
+#   - redis://host:6379/0          (servidor Redis-compatível; requer `redis`)
+# Payloads: pickle + zlib, assinados com HMAC-SHA256 (SIMULADOR_CACHE_SECRET,
+# obrigatório para ligar o L2). Entradas sem assinatura válida são ignoradas e
+# nunca chegam ao pickle.loads. Mesmo assim, o store deve ser privado ao app.
+# TTL por fonte. Eviction por tamanho (SQLite) ou pela política maxmemory do
+# servidor (Redis). Se o backend estiver indisponível, o app segue só com o L1
+# e tenta reconectar a cada CACHE_RETRY_S segundos.
+
+TTL_BCB = 60 * 60 * 6
+TTL_YAHOO = 60 * 30
+# Máximo de históricos diários de ativos mantidos no cache L1 (por processo)
+MAX_ATIVOS_CACHE = 64
+
+CACHE_URL = os.environ.get("SIMULADOR_CACHE_URL", "").strip()
+CACHE_SECRET = os.environ.get("SIMULADOR_CACHE_SECRET", "").encode("utf-8")
+CACHE_MAX_BYTES = int(float(os.environ.get("SIMULADOR_CACHE_MAX_MB", "512")) * 1024 * 1024)
+CACHE_VERSAO = "v2"
+CACHE_TIMEOUT_S = 0.5          # conexão/leitura no Redis
+CACHE_SQLITE_TIMEOUT_S = 2     # espera máxima pelo lock de escrita do SQLite
+CACHE_ACESSO_GRANULARIDADE_S = 60  # LRU do SQLite: só regrava `acesso` se mais antigo que isso
+CACHE_RETRY_S = 60
+
+_log = logging.getLogger("simulador")
+
+def _assinatura(dados: bytes) -> bytes:
+    return hmac.new(CACHE_SECRET, dados, hashlib.sha256).digest()
+
+def _serializa(valor) -> bytes:
+    dados = zlib.compress(pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL), 6)
+    return _assinatura(dados) + dados
+
+def _desserializa(payload: bytes):
+    assinatura, dados = payload[:32], payload[32:]
+    if not hmac.compare_digest(assinatura, _assinatura(dados)):
+        raise ValueError("assinatura inválida no cache compartilhado")
+    return pickle.loads(zlib.decompress(dados))
+
+def _resultado_vazio(valor) -> bool:
+    if isinstance(valor, tuple) and valor:
+        valor = valor[0]
+    if valor is None:
+        return True
+    return isinstance(valor, (pd.Series, pd.DataFrame)) and valor.empty
+
+class _CacheSQLite:
+    def __init__(self, caminho: str, max_bytes: int):
+        self.caminho = caminho
+        self.max_bytes = max_bytes
+        con = self._conectar()
+        try:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " chave TEXT PRIMARY KEY, expira REAL NOT NULL, acesso REAL NOT NULL,"
+                " tamanho INTEGER NOT NULL, payload BLOB NOT NULL)"
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS idx_cache_acesso ON cache (acesso)")
+        finally:
+            con.close()
+
+    def _conectar(self) -> sqlite3.Connection:
+        con = sqlite3.connect(self.caminho, timeout=CACHE_SQLITE_TIMEOUT_S, isolation_level=None)
+        con.execute("PRAGMA synchronous=NORMAL")
+        return con
+
+    def get(self, chave: str) -> bytes | None:
+        agora = time.time()
+        con = self._conectar()
+        try:
+            row = con.execute("SELECT payload, expira, acesso FROM cache WHERE chave = ?", (chave,)).fetchone()
+            # Leitura pura no caminho comum (WAL não bloqueia leitores). Expirados
+            # ficam para o _evict da próxima escrita.
+            if row is None or row[1] < agora:
+                return None
+            if agora - row[2] > CACHE_ACESSO_GRANULARIDADE_S:
+                try:
+                    con.execute("UPDATE cache SET acesso = ? WHERE chave = ?", (agora, chave))
+                except sqlite3.OperationalError:
+                    pass  # lock ocupado: o LRU aproximado tolera perder esta marca
+            return row[0]
+        finally:
+            con.close()
+
+    def set(self, chave: str, payload: bytes, ttl: int) -> None:
+        if len(payload) > self.max_bytes:
+            return
+        agora = time.time()
+        con = self._conectar()
+        try:
+            con.execute(
+                "INSERT OR REPLACE INTO cache (chave, expira, acesso, tamanho, payload) VALUES (?, ?, ?, ?, ?)",
+                (chave, agora + ttl, agora, len(payload), sqlite3.Binary(payload)),
+            )
+            self._evict(con, agora)
+        finally:
+            con.close()
+
+    def _evict(self, con: sqlite3.Connection, agora: float) -> None:
+        con.execute("DELETE FROM cache WHERE expira < ?", (agora,))
+        total = con.execute("SELECT COALESCE(SUM(tamanho), 0) FROM cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excesso = total - self.max_bytes
+        remover = []
+        for chave, tamanho in con.execute("SELECT chave, tamanho FROM cache ORDER BY acesso"):
+            remover.append((chave,))
+            excesso -= tamanho
+            if excesso <= 0:
+                break
+        con.executemany("DELETE FROM cache WHERE chave = ?", remover)
+
+class _CacheRedis:
+    def __init__(self, url: str, max_bytes: int):
+        import redis
+
+        self.cliente = redis.Redis.from_url(
+            url, socket_connect_timeout=CACHE_TIMEOUT_S, socket_timeout=CACHE_TIMEOUT_S
+        )
+        self.cliente.ping()
+        self.max_bytes = max_bytes
+
+    def get(self, chave: str) -> bytes | None:
+        return self.cliente.get(chave)
+
+    def set(self, chave: str, payload: bytes, ttl: int) -> None:
+        if len(payload) > self.max_bytes:
+            return
+        self.cliente.set(chave, payload, ex=int(ttl))
+
+@st.cache_resource(show_spinner=False)
+def _conectar_backend_cache():
+    # Exceções não são cacheadas pelo st.cache_resource: uma falha aqui é tentada de novo.
+    if CACHE_URL.startswith("sqlite:///"):
+        return _CacheSQLite(CACHE_URL[len("sqlite:///"):], CACHE_MAX_BYTES)
+    if CACHE_URL.startswith(("redis://", "rediss://", "unix://")):
+        return _CacheRedis(CACHE_URL, CACHE_MAX_BYTES)
+    raise ValueError(f"SIMULADOR_CACHE_URL com esquema não suportado: {CACHE_URL.split(':', 1)[0]}")
+
+@st.cache_resource(show_spinner=False)
+def _estado_backend_cache() -> dict:
+    return {"proxima_tentativa": 0.0}
+
+def _backend_cache():
+    if not CACHE_URL:
+        return None
+    if not CACHE_SECRET:
+        estado = _estado_backend_cache()
+        if not estado.get("avisado"):
+            _log.warning("SIMULADOR_CACHE_URL definido sem SIMULADOR_CACHE_SECRET: cache compartilhado desligado.")
+            estado["avisado"] = True
+        return None
+
+    estado = _estado_backend_cache()
+    if time.time() < estado["proxima_tentativa"]:
+        return None
+    try:
+        return _conectar_backend_cache()
+    except Exception as e:
+        estado["proxima_tentativa"] = time.time() + CACHE_RETRY_S
+        _log.warning("Cache compartilhado indisponível (%s); nova tentativa em %ss.", e, CACHE_RETRY_S)
+        return None
+
+def cache_compartilhado(fonte: str, ttl: int):
     """
-<style>
-    [data-testid="stMetricValue"] { font-size: 1.8rem; font-weight: 700; color: #1f77b4; }
-
-    .resumo-objetivo {
-        font-size: 0.95rem;
-        color: #333;
-        background-color: #e8f0fe;
-        padding: 18px;
-        border-radius: 10px;
-        margin-bottom: 15px;
-        border-left: 5px solid #1f77b4;
-        line-height: 1.6;
-    }
+    Decorator L2: consulta/grava o resultado do loader no backend compartilhado.
+    Falhas do backend nunca quebram o app (cai para o cálculo normal).
+    Resultados vazios/None não são compartilhados (evita propagar falhas de fonte).
+    """
+    def deco(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            backend = _backend_cache()
+            if backend is None:
+                return func(*args, **kwargs)
 
-    .instrucoes {
-        font-size: 0.9rem;
-        color: #0f172a;
-        background-color: #f8fafc;
-        padding: 15px;
-        border-radius: 10px;
-        margin-bottom: 12px;
-        border: 1px solid #e2e8f0;
-        line-height: 1.55;
-    }
-    .instrucoes b { color: #1f77b4; }
-    .instrucoes .obs { color: #475569; font-size: 0.85rem; margin-top: 8px; }
-
-    .total-card {
-        background-color: #f8fafc;
-        border: 1px solid #e2e8f0;
-        padding: 15px;
-        border-radius: 12px;
-        margin-bottom: 10px;
-        text-align: center;
-    }
-    .total-label { font-size: 0.75rem; font-weight: 800; color: #64748b; text-transform: uppercase; margin-bottom: 5px; }
-    .total-amount { font-size: 1.6rem; font-weight: 800; color: #1f77b4; }
-
-    .info-card { background-color: #f8fafc; border: 1px solid #e2e8f0; padding: 18px; border-radius: 12px; margin-top: 5px; }
-    .card-header { font-size: 0.75rem; font-weight: 800; color: #64748b; text-transform: uppercase; margin-bottom: 10px; border-bottom: 1px solid #e2e8f0; padding-bottom: 5px; }
-    .card-item { font-size: 0.9rem; margin-bottom: 6px; color: #1e293b; }
-    .card-destaque { font-size: 0.95rem; font-weight: 700; color: #0f172a; margin-top: 8px; border-top: 1px solid #e2e8f0; padding-top: 8px; }
-
-    .glossario-container { margin-top: 40px; padding: 25px; background-color: #ffffff; border: 1px solid #cbd5e1; border-radius: 12px; }
-    .glossario-termo { font-weight: 800; color: #1f77b4; font-size: 1rem; display: block; }
-    .glossario-def { color: #475569; font-size: 0.9rem; line-height: 1.5; display: block; margin-bottom: 15px; }
-
-    .warn-box {
-        background: #fff7ed;
-        border: 1px solid #fed7aa;
-        border-left: 5px solid #fb923c;
-        padding: 12px 14px;
-        border-radius: 10px;
-        color: #7c2d12;
-        margin: 10px 0 0 0;
-        font-size: 0.9rem;
-        line-height: 1.5;
-    }
-</style>
-""",
-    unsafe_allow_html=True,
-)
+            bruto = repr((func.__qualname__, args, sorted(kwargs.items())))
+            chave = f"simulador:{CACHE_VERSAO}:{fonte}:{hashlib.sha1(bruto.encode('utf-8')).hexdigest()}"
+
+            try:
+                payload = backend.get(chave)
+                if payload is not None:
+                    return _desserializa(payload)
+            except Exception:
+                pass
+
+            valor = func(*args, **kwargs)
+            if not _resultado_vazio(valor):
+                try:
+                    backend.set(chave, _serializa(valor), ttl)
+                except Exception:
+                    pass
+            return valor
+
+        return wrapper
+
+    return deco
 
 def formata_br(valor: float) -> str:
     return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
 
+def formata_usd(valor: float) -> str:
+    return "US$ " + formata_br(valor)[3:]
+
 st.title("Simulador de Acúmulo de Patrimônio")
 
 # =========================================================
@@ -93,6 +247,8 @@ def _fetch_bcb_json(codigo: int, d_inicio: date, d_fim: date, timeout: int = 30)
     params = {"formato": "json", "dataInicial": s, "dataFinal": e}
     headers = {"User-Agent": "Mozilla/5.0"}
 
+    import requests
+
     r = requests.get(url, params=params, headers=headers, timeout=timeout)
     if r.status_code != 200:
         raise RuntimeError(f"BCB/SGS HTTP {r.status_code}")
@@ -102,8 +258,7 @@ def _fetch_bcb_json(codigo: int, d_inicio: date, d_fim: date, timeout: int = 30)
         return pd.DataFrame(columns=["data", "valor"])
     return df
 
-@st.cache_data(ttl=60 * 60 * 6, show_spinner=False)
-def busca_indice_bcb(codigo: int, d_inicio: date, d_fim: date) -> pd.Series:
+def _busca_valores_bcb(codigo: int, d_inicio: date, d_fim: date) -> pd.Series:
     if d_inicio is None or d_fim is None or d_inicio > d_fim:
         return pd.Series(dtype="float64")
 
@@ -142,17 +297,30 @@ def busca_indice_bcb(codigo: int, d_inicio: date, d_fim: date) -> pd.Series:
 
     df_all["data"] = pd.to_datetime(df_all["data"], dayfirst=True, errors="coerce")
     df_all["valor"] = df_all["valor"].astype(str).str.replace(",", ".", regex=False)
-    df_all["valor"] = pd.to_numeric(df_all["valor"], errors="coerce") / 100.0
+    df_all["valor"] = pd.to_numeric(df_all["valor"], errors="coerce")
 
     df_all = df_all.dropna(subset=["data", "valor"]).set_index("data").sort_index()
     if df_all.empty:
         return pd.Series(dtype="float64")
 
     s = df_all["valor"].astype(float)
-    s = s[~s.index.duplicated(keep="last")]
-    return (1.0 + s).cumprod()
+    return s[~s.index.duplicated(keep="last")]
 
-@st.cache_data(ttl=60 * 60 * 6, show_spinner=False)
+@st.cache_data(ttl=TTL_BCB, show_spinner=False)
+@cache_compartilhado("bcb", TTL_BCB)
+def busca_indice_bcb(codigo: int, d_inicio: date, d_fim: date) -> pd.Series:
+    s = _busca_valores_bcb(codigo, d_inicio, d_fim)
+    if s.empty:
+        return s
+    return (1.0 + s / 100.0).cumprod()
+
+@st.cache_data(ttl=TTL_BCB, show_spinner=False)
+@cache_compartilhado("bcb", TTL_BCB)
+def busca_cotacao_bcb(codigo: int, d_inicio: date, d_fim: date) -> pd.Series:
+    # Séries de nível (ex.: 1 = dólar PTAX venda, R$ por US$): sem acumulação.
+    return _busca_valores_bcb(codigo, d_inicio, d_fim)
+
+@st.cache_data(ttl=TTL_BCB, show_spinner=False)
 def carregar_renda_fixa(d_inicio: date, d_fim: date) -> tuple[pd.Series, str]:
     s_cdi = busca_indice_bcb(12, d_inicio, d_fim)
     if s_cdi is not None and not s_cdi.empty:
@@ -184,7 +352,8 @@ def _split_efetivo_para_evitar_degrau(df: pd.DataFrame) -> pd.Series:
 
     return eff
 
-@st.cache_data(ttl=60 * 30, show_spinner=False)
+@st.cache_data(ttl=TTL_YAHOO, max_entries=MAX_ATIVOS_CACHE, show_spinner=False)
+@cache_compartilhado("yahoo", TTL_YAHOO)
 def carregar_dados_completos(t: str) -> pd.DataFrame | None:
     if not t:
         return None
@@ -192,6 +361,8 @@ def carregar_dados_completos(t: str) -> pd.DataFrame | None:
     t_sa = t if ".SA" in t else t + ".SA"
 
     try:
+        import yfinance as yf
+
         tk = yf.Ticker(t_sa)
         df = tk.history(start="1900-01-01", auto_adjust=False, actions=True, interval="1d")
 
@@ -229,11 +400,14 @@ def carregar_dados_completos(t: str) -> pd.DataFrame | None:
     except Exception:
         return None
 
-@st.cache_data(ttl=60 * 30, show_spinner=False)
-def carregar_ibov(d_inicio: date, d_fim: date) -> pd.Series:
+@st.cache_data(ttl=TTL_YAHOO, show_spinner=False)
+@cache_compartilhado("yahoo", TTL_YAHOO)
+def carregar_serie_yahoo(simbolo: str, d_inicio: date, d_fim: date) -> pd.Series:
     try:
+        import yfinance as yf
+
         start = max(pd.Timestamp(d_inicio), pd.Timestamp("1990-01-01"))
-        df = yf.download("^BVSP", start=start.date(), end=d_fim + timedelta(days=1), progress=False, auto_adjust=False)
+        df = yf.download(simbolo, start=start.date(), end=d_fim + timedelta(days=1), progress=False, auto_adjust=False)
         if df is None or df.empty:
             return pd.Series(dtype="float64")
         if isinstance(df.columns, pd.MultiIndex):
@@ -241,10 +415,144 @@ def carregar_ibov(d_inicio: date, d_fim: date) -> pd.Series:
         s = df["Close"].dropna().copy()
         if getattr(s.index, "tz", None) is not None:
             s.index = s.index.tz_localize(None)
-        return s.sort_index()
+        s = s.sort_index()
+        return s[~s.index.duplicated(keep="last")]
     except Exception:
         return pd.Series(dtype="float64")
 
+def carregar_ibov(d_inicio: date, d_fim: date) -> pd.Series:
+    return carregar_serie_yahoo("^BVSP", d_inicio, d_fim)
+
+def carregar_sp500_tr(d_inicio: date, d_fim: date) -> pd.Series:
+    # S&P 500 Total Return (em US$, dividendos reinvestidos)
+    return carregar_serie_yahoo("^SP500TR", d_inicio, d_fim)
+
+FX_LOOKBACK_DIAS = 10
+
+@st.cache_data(ttl=TTL_BCB, show_spinner=False)
+def carregar_cambio_usd(d_inicio: date, d_fim: date) -> tuple[pd.Series, str]:
+    s_ptax = busca_cotacao_bcb(1, d_inicio, d_fim)
+    if s_ptax is not None and not s_ptax.empty:
+        return s_ptax, "PTAX (BCB)"
+
+    s_yahoo = carregar_serie_yahoo("BRL=X", d_inicio, d_fim)
+    if s_yahoo is not None and not s_yahoo.empty:
+        return s_yahoo, "USD/BRL (Yahoo)"
+
+    return pd.Series(dtype="float64"), "USD/BRL"
+
+# ---------------------------------------------------------
+# Intraday: estudo do horário de execução do aporte
+# ---------------------------------------------------------
+# O Yahoo limita o histórico intraday (e o volume por requisição), então a
+# janela é baixada em blocos de datas. Cada bloco é reduzido a estatísticas
+# por horário (soma/contagem) e descartado: só a tabela agregada vai para a
+# sessão. Os blocos ficam em cache como DataFrame float32 (Open/Close apenas).
+
+INTERVALOS_INTRADAY = {
+    # intervalo: (histórico máximo no Yahoo em dias, dias por requisição)
+    "1h": (729, 120),
+    "30m": (59, 30),
+    "15m": (59, 30),
+}
+
+# Bloco vazio com pelo menos isso de dias úteis é tratado como falha da fonte
+# (throttle/erro silencioso), não como janela sem pregão.
+INTRADAY_MIN_DIAS_UTEIS_FALHA = 3
+
+@st.cache_data(ttl=TTL_YAHOO, show_spinner=False)
+@cache_compartilhado("yahoo_intraday_oc", TTL_YAHOO)
+def _baixar_bloco_intraday(t_sa: str, intervalo: str, d1: date, d2: date) -> pd.DataFrame:
+    # Falhas levantam exceção (não entram no cache) para que o chamador possa contá-las.
+    # O yfinance, por padrão, engole erros e devolve um DataFrame vazio: por isso a
+    # falha é detectada pelo resultado vazio numa janela com pregões, sem depender
+    # de flags de configuração do yfinance.
+    import yfinance as yf
+
+    df = yf.Ticker(t_sa).history(
+        start=d1, end=d2 + timedelta(days=1), interval=intervalo, auto_adjust=False, actions=False
+    )
+    if df is None or df.empty or not {"Open", "Close"}.issubset(df.columns):
+        if np.busday_count(d1, d2 + timedelta(days=1)) >= INTRADAY_MIN_DIAS_UTEIS_FALHA:
+            raise RuntimeError(f"Yahoo sem barras intraday para {t_sa} em {d1} → {d2}")
+        return pd.DataFrame(columns=["Open", "Close"], dtype="float32")
+
+    df = df[["Open", "Close"]].dropna()
+    if getattr(df.index, "tz", None) is not None:
+        df.index = df.index.tz_convert("America/Sao_Paulo").tz_localize(None)
+    return df.sort_index().astype("float32")
+
+def iter_blocos_intraday(
+    t: str,
+    intervalo: str,
+    d_inicio: date,
+    d_fim: date,
+    status: dict | None = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Gera os blocos de barras (Open/Close) da janela. Se `status` for passado,
+    recebe "blocos" (total tentado) e "falhas" (blocos que a fonte não entregou).
+    """
+    if status is None:
+        status = {}
+    status.update(blocos=0, falhas=0)
+    if not t or intervalo not in INTERVALOS_INTRADAY:
+        return
+
+    t_sa = t if ".SA" in t else t + ".SA"
+    hist_max, dias_bloco = INTERVALOS_INTRADAY[intervalo]
+
+    cur = max(d_inicio, date.today() - timedelta(days=hist_max))
+    while cur <= d_fim:
+        fim_bloco = min(d_fim, cur + timedelta(days=dias_bloco - 1))
+        status["blocos"] += 1
+        try:
+            df = _baixar_bloco_intraday(t_sa, intervalo, cur, fim_bloco)
+        except Exception:
+            status["falhas"] += 1
+            df = None
+        if df is not None and not df.empty:
+            yield df
+        cur = fim_bloco + timedelta(days=1)
+
+def agregar_horarios_intraday(blocos: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Para cada horário de barra, quantas cotas a mais (%) o aporte compraria
+    executando na ABERTURA da barra daquele horário (Open) em vez de no
+    fechamento do mesmo dia (Close do último candle).
+    - agregação incremental (soma, soma dos quadrados, contagem) bloco a bloco;
+      os blocos são sempre dias inteiros, então nenhum dia é partido.
+    """
+    acum = None
+    for bloco in blocos:
+        bloco = bloco.astype("float64")
+        fechamento = bloco["Close"].groupby(bloco.index.normalize()).transform("last")
+        razao = fechamento / bloco["Open"]
+        razao = razao[np.isfinite(razao)]
+        if razao.empty:
+            continue
+
+        v = razao.to_numpy()
+        parcial = (
+            pd.DataFrame({"n": 1, "soma": v, "soma_q": v * v}, index=razao.index.strftime("%H:%M"))
+            .groupby(level=0)
+            .sum()
+        )
+        acum = parcial if acum is None else acum.add(parcial, fill_value=0)
+
+    if acum is None or acum.empty:
+        return pd.DataFrame(columns=["dias", "cotas_vs_fechamento_pct", "desvio_pct"])
+
+    media = acum["soma"] / acum["n"]
+    desvio = np.sqrt((acum["soma_q"] / acum["n"] - media**2).clip(lower=0.0))
+    out = pd.DataFrame({
+        "dias": acum["n"].astype(int),
+        "cotas_vs_fechamento_pct": (media - 1.0) * 100.0,
+        "desvio_pct": desvio * 100.0,
+    }).sort_index()
+    out.index.name = "horario"
+    return out
+
 def ultimo_pregao_ate(df_index: pd.Index, dt: pd.Timestamp) -> pd.Timestamp | None:
     pos = df_index.get_indexer([dt], method="ffill")[0]
     if pos == -1:
@@ -307,7 +615,29 @@ def gerar_datas_aporte_mensal(df_index: pd.Index, dt_inicio: pd.Timestamp, dt_fi
 
     return pd.DatetimeIndex(datas_exec)
 
-def calc_valor_corrigido_por_indice(valor_mensal: float, datas_aporte: pd.DatetimeIndex, serie_indice: pd.Series, data_ref: pd.Timestamp) -> float | None:
+def _valores_nas_datas(serie: pd.Series, datas: pd.DatetimeIndex) -> np.ndarray | None:
+    # Último valor disponível em cada data (ffill), numa única passada vetorizada.
+    s = pd.Series(serie).dropna().sort_index()
+    s = s[~s.index.duplicated(keep="last")]
+    at = s.reindex(datas, method="ffill")
+    if at.isna().any():
+        return None
+    return at.to_numpy(dtype=float)
+
+def calc_valor_corrigido_por_indice(
+    valor_mensal: float,
+    datas_aporte: pd.DatetimeIndex,
+    serie_indice: pd.Series,
+    data_ref: pd.Timestamp,
+    fx_at: np.ndarray | None = None,
+) -> float | None:
+    """
+    Valor em data_ref dos aportes mensais corrigidos pela serie_indice.
+    - fx_at (opcional): cotação em R$ por unidade da moeda estrangeira em cada data
+      de aporte (alinhada a datas_aporte, ver _valores_nas_datas). Cada aporte é
+      convertido na cotação da própria data e o resultado sai nessa moeda
+      (serie_indice deve estar na mesma moeda, ex.: S&P 500 TR em US$).
+    """
     if serie_indice is None or serie_indice.empty:
         return None
 
@@ -316,11 +646,13 @@ def calc_valor_corrigido_por_indice(valor_mensal: float, datas_aporte: pd.Dateti
     if pd.isna(end):
         return None
 
-    at = s.reindex(datas_aporte, method="ffill")
-    if at.isna().any():
+    at = _valores_nas_datas(s, datas_aporte)
+    if at is None:
         return None
 
-    return float((valor_mensal * (end / at)).sum())
+    aportes = valor_mensal if fx_at is None else valor_mensal / fx_at
+
+    return float((aportes * (float(end) / at)).sum())
 
 def calcular_horizonte(
     df_full: pd.DataFrame,
@@ -330,6 +662,8 @@ def calcular_horizonte(
     s_rf: pd.Series,
     s_ipca: pd.Series,
     s_ibov: pd.Series,
+    s_fx: pd.Series | None = None,
+    s_sp500: pd.Series | None = None,
 ):
     if df_full is None or df_full.empty or valor_mensal <= 0:
         return None
@@ -362,6 +696,18 @@ def calcular_horizonte(
     v_ipca = calc_valor_corrigido_por_indice(valor_mensal, datas_aporte, s_ipca, data_ref) if (s_ipca is not None and not s_ipca.empty) else None
     v_ibov = calc_valor_corrigido_por_indice(valor_mensal, datas_aporte, s_ibov, data_ref) if (s_ibov is not None and not s_ibov.empty) else None
 
+    # Visão em moeda estrangeira: aportes convertidos na cotação de cada data
+    fx_ref = vf_usd = vi_usd = v_sp500_usd = None
+    if s_fx is not None and not s_fx.empty:
+        fx_at = _valores_nas_datas(s_fx, datas_aporte)
+        fx_end = pd.Series(s_fx).dropna().sort_index().asof(data_ref)
+        if fx_at is not None and pd.notna(fx_end) and fx_end > 0:
+            fx_ref = float(fx_end)
+            vf_usd = vf_ativo / fx_ref
+            vi_usd = float((valor_mensal / fx_at).sum())
+            if s_sp500 is not None and not s_sp500.empty:
+                v_sp500_usd = calc_valor_corrigido_por_indice(valor_mensal, datas_aporte, s_sp500, data_ref, fx_at=fx_at)
+
     return {
         "data_ref": data_ref,
         "dt_inicio_eff": dt_inicio_eff,
@@ -371,6 +717,10 @@ def calcular_horizonte(
         "v_rf": v_rf,
         "v_ipca": v_ipca,
         "v_ibov": v_ibov,
+        "fx_ref": fx_ref,
+        "vf_usd": vf_usd,
+        "vi_usd": vi_usd,
+        "v_sp500_usd": v_sp500_usd,
         "n_aportes": int(len(datas_aporte)),
     }
 
@@ -392,6 +742,318 @@ def serie_pct_desde_base(s: pd.Series, dt_base: pd.Timestamp, dt_end: pd.Timesta
 
     return (s_plot / float(base) - 1.0) * 100.0
 
+# =========================================================
+# 2.1) EXPORTAÇÃO / IMPORTAÇÃO EM LOTE
+# =========================================================
+
+EXPORT_CHUNK_ROWS = 50_000
+LOTE_CHUNK_ROWS = 500
+
+# Arquivos gerados (exportação e lote) ficam em um diretório por sessão e são
+# apagados após ARQUIVOS_TTL segundos, mesmo que a sessão seja abandonada.
+ARQUIVOS_DIR = os.path.join(tempfile.gettempdir(), "simulador_arquivos")
+ARQUIVOS_TTL = 60 * 60
+
+COLUNAS_CENARIO = ["ticker", "aporte", "inicio", "fim"]
+ALIASES_CENARIO = {"start": "inicio", "end": "fim", "data_inicio": "inicio", "data_fim": "fim"}
+
+COLUNAS_RESULTADO_DATA = ["inicio", "fim", "data_ref", "inicio_efetivo"]
+COLUNAS_RESULTADO_FLOAT = ["aporte", "investido", "valor_final", "lucro", "v_rf", "v_ipca", "v_ibov"]
+
+def montar_base_diaria(
+    df_acao: pd.DataFrame,
+    s_rf: pd.Series,
+    s_ipca: pd.Series,
+    s_ibov: pd.Series,
+    dt_inicio: pd.Timestamp,
+    dt_fim: pd.Timestamp,
+    s_fx: pd.Series | None = None,
+    s_sp500: pd.Series | None = None,
+) -> pd.DataFrame:
+    """
+    Base diária alinhada ao calendário de pregões do ativo:
+    fatores do ativo + níveis dos benchmarks (ffill até cada pregão).
+    """
+    cols = ["Close", "Dividends", "Stock Splits", "Price_Fact", "Total_Fact"]
+    df = df_acao.loc[(df_acao.index >= dt_inicio) & (df_acao.index <= dt_fim), cols].copy()
+    df.index.name = "data"
+    if df.empty:
+        return df
+
+    series = [("RF", s_rf), ("IPCA", s_ipca), ("Ibovespa", s_ibov)]
+    if s_fx is not None and not s_fx.empty:
+        series += [("USD_BRL", s_fx), ("SP500_TR_USD", s_sp500)]
+
+    for nome, s in series:
+        if s is None or s.empty:
+            df[nome] = np.nan
+            continue
+        s = pd.Series(s).dropna().sort_index()
+        s = s[~s.index.duplicated(keep="last")]
+        df[nome] = s.reindex(df.index, method="ffill").astype(float)
+
+    return df
+
+def iter_csv_chunks(
+    df: pd.DataFrame,
+    chunk_rows: int = EXPORT_CHUNK_ROWS,
+    index: bool = True,
+    header: bool = True,
+) -> Iterator[bytes]:
+    if df.empty:
+        if header:
+            yield df.to_csv(index=index).encode("utf-8")
+        return
+    for i in range(0, len(df), chunk_rows):
+        yield df.iloc[i : i + chunk_rows].to_csv(header=(header and i == 0), index=index).encode("utf-8")
+
+class _GravadorTabela:
+    """
+    Grava DataFrames em blocos num arquivo CSV ou Parquet (um row group por bloco).
+    Só o bloco corrente fica em memória.
+    """
+
+    def __init__(self, caminho: str, formato: str, index: bool = True):
+        self.formato = formato
+        self.index = index
+        self.fh = open(caminho, "wb")
+        self.writer = None
+        self.linhas = 0
+
+    def escrever(self, df: pd.DataFrame) -> None:
+        if self.formato == "Parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            for i in range(0, max(len(df), 1), EXPORT_CHUNK_ROWS):
+                tabela = pa.Table.from_pandas(df.iloc[i : i + EXPORT_CHUNK_ROWS], preserve_index=self.index)
+                if self.writer is None:
+                    self.writer = pq.ParquetWriter(self.fh, tabela.schema)
+                self.writer.write_table(tabela)
+        else:
+            for parte in iter_csv_chunks(df, index=self.index, header=(self.linhas == 0)):
+                self.fh.write(parte)
+        self.linhas += len(df)
+
+    def fechar(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.fh.close()
+
+def _dir_arquivos_sessao() -> str:
+    # Um diretório por sessão; arquivos antigos de qualquer sessão são varridos por TTL.
+    sessao = st.session_state.setdefault("_sessao_arquivos", uuid.uuid4().hex)
+    caminho = os.path.join(ARQUIVOS_DIR, sessao)
+    os.makedirs(caminho, exist_ok=True)
+    return caminho
+
+def limpar_arquivos_antigos(ttl: int = ARQUIVOS_TTL) -> None:
+    if not os.path.isdir(ARQUIVOS_DIR):
+        return
+    limite = time.time() - ttl
+    for raiz, dirs, arquivos in os.walk(ARQUIVOS_DIR, topdown=False):
+        for nome in arquivos:
+            caminho = os.path.join(raiz, nome)
+            try:
+                if os.path.getmtime(caminho) < limite:
+                    os.remove(caminho)
+            except OSError:
+                pass
+        if raiz != ARQUIVOS_DIR:
+            try:
+                os.rmdir(raiz)  # só remove se estiver vazio
+            except OSError:
+                pass
+
+def leitor_arquivo(caminho: str):
+    """
+    Callable para st.download_button: o arquivo só é lido quando o usuário clica,
+    em vez de ser carregado no media manager a cada rerun.
+    """
+    def ler() -> bytes:
+        with open(caminho, "rb") as fh:
+            return fh.read()
+
+    return ler
+
+def exportar_para_arquivo(df: pd.DataFrame, formato: str, nome: str, index: bool = True) -> str:
+    ext = "parquet" if formato == "Parquet" else "csv"
+    caminho = os.path.join(_dir_arquivos_sessao(), f"{nome}.{ext}")
+    gravador = _GravadorTabela(caminho, formato, index=index)
+    try:
+        gravador.escrever(df)
+    finally:
+        gravador.fechar()
+    return caminho
+
+def _parse_datas_cenario(col: pd.Series) -> pd.Series:
+    # ISO (aaaa-mm-dd) primeiro; dayfirst só para o que sobrar (ex.: dd/mm/aaaa).
+    # Aplicar dayfirst a tudo inverteria dia e mês das datas ISO.
+    datas = pd.to_datetime(col, format="ISO8601", errors="coerce")
+    resto = datas.isna() & col.notna()
+    if resto.any():
+        datas[resto] = pd.to_datetime(col[resto], format="mixed", dayfirst=True, errors="coerce")
+    return datas.dt.normalize().astype("datetime64[ns]")
+
+def _normaliza_cenarios(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.rename(columns=lambda c: str(c).strip().lower()).rename(columns=ALIASES_CENARIO)
+    faltando = [c for c in COLUNAS_CENARIO if c not in df.columns]
+    if faltando:
+        raise ValueError(f"Colunas ausentes no arquivo de cenários: {', '.join(faltando)}")
+
+    df = df[COLUNAS_CENARIO].copy()
+    df["ticker"] = df["ticker"].fillna("").astype(str).str.upper().str.strip()
+    df["aporte"] = pd.to_numeric(df["aporte"], errors="coerce")
+    for col in ["inicio", "fim"]:
+        df[col] = _parse_datas_cenario(df[col])
+    return df
+
+def ler_cenarios_em_blocos(arquivo, nome: str, chunk_rows: int = LOTE_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    if hasattr(arquivo, "seek"):
+        arquivo.seek(0)
+
+    if nome.lower().endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        pf = pq.ParquetFile(arquivo)
+        for batch in pf.iter_batches(batch_size=chunk_rows):
+            yield _normaliza_cenarios(batch.to_pandas())
+        return
+
+    for bloco in pd.read_csv(arquivo, chunksize=chunk_rows, sep=None, engine="python", dtype={"ticker": str}):
+        yield _normaliza_cenarios(bloco)
+
+def _periodo_total_cenarios(arquivo, nome: str) -> tuple[date, date] | None:
+    d_min, d_max = None, None
+    for bloco in ler_cenarios_em_blocos(arquivo, nome):
+        ini, fim = bloco["inicio"].min(), bloco["fim"].max()
+        if pd.notna(ini):
+            d_min = ini if d_min is None else min(d_min, ini)
+        if pd.notna(fim):
+            d_max = fim if d_max is None else max(d_max, fim)
+    if d_min is None or d_max is None or d_min >= d_max:
+        return None
+    return d_min.date(), min(d_max.date(), date.today())
+
+def _tipar_resultados_lote(linhas: list[dict]) -> pd.DataFrame:
+    df = pd.DataFrame(linhas, columns=[
+        "ticker", "aporte", "inicio", "fim", "status", "data_ref", "inicio_efetivo",
+        "n_aportes", "investido", "valor_final", "lucro", "v_rf", "v_ipca", "v_ibov",
+    ])
+    # Unidade fixa: um bloco só com NaT viraria datetime64[s] e quebraria o schema do Parquet.
+    for col in COLUNAS_RESULTADO_DATA:
+        df[col] = pd.to_datetime(df[col], errors="coerce").astype("datetime64[ns]")
+    for col in COLUNAS_RESULTADO_FLOAT:
+        df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+    df["n_aportes"] = pd.to_numeric(df["n_aportes"], errors="coerce").astype("Int64")
+    df["ticker"] = df["ticker"].astype(str)
+    df["status"] = df["status"].astype(str)
+    return df
+
+def simular_cenario(
+    cenario,
+    ativo: dict,
+    s_rf: pd.Series,
+    s_ipca: pd.Series,
+    s_ibov: pd.Series,
+) -> dict:
+    linha = {
+        "ticker": cenario.ticker,
+        "aporte": cenario.aporte,
+        "inicio": cenario.inicio,
+        "fim": cenario.fim,
+    }
+    if pd.isna(cenario.ticker) or not cenario.ticker or pd.isna(cenario.aporte) or pd.isna(cenario.inicio) or pd.isna(cenario.fim):
+        return {**linha, "status": "cenário inválido"}
+    if cenario.inicio >= cenario.fim:
+        return {**linha, "status": "início >= fim"}
+
+    # Só o ativo corrente é mantido aqui; o bloco é processado agrupado por ticker.
+    if ativo.get("ticker") != cenario.ticker:
+        ativo["ticker"] = cenario.ticker
+        ativo["df"] = carregar_dados_completos(cenario.ticker)
+    df_acao = ativo["df"]
+    if df_acao is None or df_acao.empty:
+        return {**linha, "status": "ticker sem dados"}
+
+    res = calcular_horizonte(
+        df_full=df_acao,
+        valor_mensal=float(cenario.aporte),
+        dt_inicio_user=cenario.inicio,
+        dt_ref_target=cenario.fim,
+        s_rf=s_rf,
+        s_ipca=s_ipca,
+        s_ibov=s_ibov,
+    )
+    if res is None:
+        return {**linha, "status": "dados insuficientes"}
+
+    return {
+        **linha,
+        "status": "ok",
+        "data_ref": res["data_ref"],
+        "inicio_efetivo": res["dt_inicio_eff"],
+        "n_aportes": res["n_aportes"],
+        "investido": res["vi"],
+        "valor_final": res["vf"],
+        "lucro": res["lucro"],
+        "v_rf": res["v_rf"],
+        "v_ipca": res["v_ipca"],
+        "v_ibov": res["v_ibov"],
+    }
+
+def executar_lote(arquivo, nome: str, formato_saida: str, progresso=None) -> tuple[str, int]:
+    """
+    Roda um arquivo de cenários (ticker, aporte, inicio, fim) em blocos.
+    - Benchmarks são carregados UMA vez para o período total do arquivo.
+    - Cada bloco é processado agrupado por ticker (um download/cópia por ticker
+      no bloco) e gravado na ordem original do arquivo.
+    - Ativos vêm de carregar_dados_completos, cujo cache L1 é limitado por
+      MAX_ATIVOS_CACHE; aqui só o ativo corrente fica em memória.
+    - Resultados são gravados em disco a cada bloco (memória não cresce com o arquivo).
+    """
+    periodo = _periodo_total_cenarios(arquivo, nome)
+    if periodo is None:
+        raise ValueError("Nenhum cenário com datas válidas no arquivo.")
+    d_ini, d_fim = periodo
+
+    s_rf, _ = carregar_renda_fixa(d_ini, d_fim)
+    s_ipca = busca_indice_bcb(433, d_ini, d_fim)
+    s_ibov = carregar_ibov(d_ini, d_fim)
+
+    limpar_arquivos_antigos()
+    ext = "parquet" if formato_saida == "Parquet" else "csv"
+    caminho = os.path.join(_dir_arquivos_sessao(), f"simulacao_lote_{uuid.uuid4().hex[:8]}.{ext}")
+
+    ativo: dict = {}
+    gravador = _GravadorTabela(caminho, formato_saida, index=False)
+    try:
+        for bloco in ler_cenarios_em_blocos(arquivo, nome):
+            bloco = bloco.reset_index(drop=True)
+            linhas: dict[int, dict] = {}
+            ordem = bloco.sort_values("ticker", kind="stable")
+            for pos, c in zip(ordem.index, ordem.itertuples(index=False)):
+                try:
+                    linhas[pos] = simular_cenario(c, ativo, s_rf, s_ipca, s_ibov)
+                except Exception as e:
+                    # Um cenário problemático não derruba o lote inteiro.
+                    ativo.clear()
+                    linhas[pos] = {
+                        "ticker": c.ticker, "aporte": c.aporte, "inicio": c.inicio, "fim": c.fim,
+                        "status": f"erro: {type(e).__name__}",
+                    }
+
+            gravador.escrever(_tipar_resultados_lote([linhas[pos] for pos in bloco.index]))
+            if progresso is not None:
+                progresso(gravador.linhas)
+    except Exception:
+        gravador.fechar()
+        os.remove(caminho)
+        raise
+    gravador.fechar()
+
+    return caminho, gravador.linhas
+
 # =========================================================
 # 3) BARRA LATERAL (FORM + INSTRUÇÕES)
 # =========================================================
@@ -426,6 +1088,11 @@ with st.sidebar.form("form_simulador"):
     data_inicio = st.date_input("Início", d_ini_padrao, format="DD/MM/YYYY")
     # ✅ Fim não pode passar hoje
     data_fim = st.date_input("Fim", d_fim_padrao, format="DD/MM/YYYY", max_value=hoje)
+    intervalo_intraday = st.selectbox(
+        "Estudo de horário do aporte (intraday)",
+        ["Desligado", *INTERVALOS_INTRADAY.keys()],
+        help="Usa barras intraday da janela recente (limite da fonte: ~60 dias para 15m/30m, ~2 anos para 1h).",
+    )
 
     btn_analisar = st.form_submit_button("🔍 Analisar Patrimônio")
 
@@ -433,6 +1100,17 @@ st.sidebar.subheader("Benchmarks")
 mostrar_rf = st.sidebar.checkbox("Renda Fixa (CDI/Selic)", value=True, key="mostrar_rf")
 mostrar_ipca = st.sidebar.checkbox("IPCA (Inflação)", value=True, key="mostrar_ipca")
 mostrar_ibov = st.sidebar.checkbox("Ibovespa (Mercado)", value=True, key="mostrar_ibov")
+mostrar_usd = st.sidebar.checkbox("Visão em dólar (US$) + S&P 500 TR", value=False, key="mostrar_usd")
+
+with st.sidebar.expander("📦 Simulação em lote (CSV/Parquet)"):
+    arquivo_lote = st.file_uploader(
+        "Arquivo de cenários",
+        type=["csv", "parquet"],
+        help="Colunas: ticker, aporte, inicio, fim (uma linha por cenário).",
+        key="arquivo_lote",
+    )
+    formato_lote = st.radio("Formato do resultado", ["CSV", "Parquet"], horizontal=True, key="formato_lote")
+    btn_lote = st.button("▶️ Rodar lote", disabled=arquivo_lote is None)
 
 st.sidebar.markdown(
     """
@@ -467,6 +1145,14 @@ if btn_analisar:
         st.error("Ticker não encontrado ou sem dados suficientes (Yahoo Finance).")
         st.stop()
 
+    tabela_intraday = None
+    status_intraday = {"blocos": 0, "falhas": 0}
+    if intervalo_intraday in INTERVALOS_INTRADAY:
+        with st.spinner(f"Agregando barras intraday ({intervalo_intraday})..."):
+            tabela_intraday = agregar_horarios_intraday(
+                iter_blocos_intraday(ticker_input, intervalo_intraday, data_inicio, data_fim, status=status_intraday)
+            )
+
     st.session_state["analysis_ready"] = True
     st.session_state["params"] = {
         "ticker": ticker_input,
@@ -479,6 +1165,39 @@ if btn_analisar:
     st.session_state["nome_rf"] = nome_rf
     st.session_state["s_ipca"] = s_ipca
     st.session_state["s_ibov"] = s_ibov
+    st.session_state["intraday"] = {"intervalo": intervalo_intraday, "tabela": tabela_intraday, **status_intraday}
+
+if btn_lote and arquivo_lote is not None:
+    saida_anterior = st.session_state.pop("lote_saida", None)
+    if saida_anterior and os.path.exists(saida_anterior["caminho"]):
+        os.remove(saida_anterior["caminho"])
+
+    status_lote = st.empty()
+    try:
+        with st.spinner("Rodando simulação em lote..."):
+            caminho_lote, n_lote = executar_lote(
+                arquivo_lote,
+                arquivo_lote.name,
+                formato_lote,
+                progresso=lambda n: status_lote.caption(f"Cenários processados: {n}"),
+            )
+    except Exception as e:
+        st.error(f"Falha na simulação em lote: {e}")
+    else:
+        st.session_state["lote_saida"] = {"caminho": caminho_lote, "n": n_lote, "formato": formato_lote}
+    status_lote.empty()
+
+if st.session_state.get("lote_saida"):
+    saida = st.session_state["lote_saida"]
+    if os.path.exists(saida["caminho"]):
+        ext = "parquet" if saida["formato"] == "Parquet" else "csv"
+        st.success(f"Simulação em lote concluída: {saida['n']} cenários.")
+        st.download_button(
+            "⬇️ Baixar resultados do lote",
+            data=leitor_arquivo(saida["caminho"]),
+            file_name=f"simulacao_lote.{ext}",
+            mime="application/octet-stream" if ext == "parquet" else "text/csv",
+        )
 
 if not st.session_state.get("analysis_ready", False):
     st.markdown(
@@ -512,6 +1231,18 @@ nome_rf = st.session_state.get("nome_rf", "Renda Fixa")
 s_ipca = st.session_state.get("s_ipca", pd.Series(dtype="float64"))
 s_ibov = st.session_state.get("s_ibov", pd.Series(dtype="float64"))
 
+# Câmbio e S&P 500 só são buscados se a visão em dólar estiver ligada (cacheados como os demais índices).
+# Começam FX_LOOKBACK_DIAS antes do início: um 1º aporte em feriado americano ou dia sem PTAX
+# usa a última cotação anterior em vez de derrubar a visão em dólar.
+s_fx, nome_fx, s_sp500 = pd.Series(dtype="float64"), "USD/BRL", pd.Series(dtype="float64")
+if mostrar_usd:
+    d_ini_fx = data_inicio_exec - timedelta(days=FX_LOOKBACK_DIAS)
+    with st.spinner("Sincronizando câmbio e S&P 500..."):
+        s_fx, nome_fx = carregar_cambio_usd(d_ini_fx, data_fim_exec)
+        s_sp500 = carregar_sp500_tr(d_ini_fx, data_fim_exec)
+    if s_fx.empty:
+        st.warning("Não foi possível obter a cotação USD/BRL (BCB e Yahoo). A visão em dólar ficará indisponível.")
+
 dt_ini_user = pd.to_datetime(data_inicio_exec).normalize()
 dt_fim_user = pd.to_datetime(data_fim_exec).normalize()
 
@@ -547,6 +1278,9 @@ O gráfico ficará “em branco” antes dessa data. Nos cálculos, os aportes p
 # -------------------------
 # GRÁFICO
 # -------------------------
+# plotly só é importado quando há gráfico a renderizar (a tela de boas-vindas não paga esse custo)
+import plotly.graph_objects as go
+
 fig = go.Figure()
 
 if mostrar_rf and (s_rf is not None) and (not s_rf.empty):
@@ -616,6 +1350,7 @@ st.subheader("Simulação de Patrimônio Acumulado")
 
 horizontes = [10, 5, 1]
 cols = st.columns(3)
+resultados_horizonte = []
 
 dt_ini_eff = proximo_pregao_a_partir(df_acao.index, dt_ini_user)
 if dt_ini_eff is None:
@@ -654,6 +1389,8 @@ for anos, col in zip(horizontes, cols):
             s_rf=s_rf if mostrar_rf else pd.Series(dtype="float64"),
             s_ipca=s_ipca if mostrar_ipca else pd.Series(dtype="float64"),
             s_ibov=s_ibov if mostrar_ibov else pd.Series(dtype="float64"),
+            s_fx=s_fx,
+            s_sp500=s_sp500,
         )
 
         if res is None:
@@ -672,6 +1409,23 @@ for anos, col in zip(horizontes, cols):
             )
             continue
 
+        resultados_horizonte.append({
+            "horizonte_anos": anos,
+            "inicio_efetivo": res["dt_inicio_eff"],
+            "data_ref": res["data_ref"],
+            "n_aportes": res["n_aportes"],
+            "investido": res["vi"],
+            "valor_final": res["vf"],
+            "lucro": res["lucro"],
+            "v_rf": res["v_rf"],
+            "v_ipca": res["v_ipca"],
+            "v_ibov": res["v_ibov"],
+            "cambio_ref": res["fx_ref"],
+            "valor_final_usd": res["vf_usd"],
+            "investido_usd": res["vi_usd"],
+            "v_sp500_usd": res["v_sp500_usd"],
+        })
+
         vf = res["vf"]
         vi = res["vi"]
         lucro = res["lucro"]
@@ -699,6 +1453,18 @@ for anos, col in zip(horizontes, cols):
         if not bench_lines:
             bench_lines.append('<div class="card-item">—</div>')
 
+        usd_lines = []
+        if mostrar_usd and res["vf_usd"] is not None:
+            sp500_str = formata_usd(res["v_sp500_usd"]) if res["v_sp500_usd"] is not None else "—"
+            usd_lines = [
+                '<hr style="margin: 10px 0; border: 0; border-top: 1px solid #e2e8f0;">',
+                '<div class="card-header">Visão em Dólar (US$)</div>',
+                f'<div class="card-item">💲 <b>Patrimônio:</b> {formata_usd(res["vf_usd"])}</div>',
+                f'<div class="card-item">🇺🇸 <b>S&amp;P 500 TR:</b> {sp500_str}</div>',
+                f'<div class="card-item">💵 <b>Investido (câmbio de cada aporte):</b> {formata_usd(res["vi_usd"])}</div>',
+                f'<div class="card-item">💱 <b>{nome_fx} na avaliação:</b> {formata_br(res["fx_ref"])}</div>',
+            ]
+
         inicio_eff_str = res["dt_inicio_eff"].date().strftime("%d/%m/%Y")
         data_ref_str = res["data_ref"].date().strftime("%d/%m/%Y")
 
@@ -714,11 +1480,99 @@ for anos, col in zip(horizontes, cols):
             <div class="card-item">💵 <b>Capital Nominal Investido:</b> {formata_br(vi)}</div>
             <div class="card-item">🗓️ <b>Nº de aportes:</b> {res['n_aportes']}</div>
             <div class="card-destaque">💰 Lucro Acumulado: {formata_br(lucro)}</div>
+            {''.join(usd_lines)}
         </div>
         """,
             unsafe_allow_html=True,
         )
 
+# -------------------------
+# HORÁRIO DO APORTE (INTRADAY)
+# -------------------------
+intraday = st.session_state.get("intraday") or {}
+tabela_intraday = intraday.get("tabela")
+if tabela_intraday is not None:
+    st.subheader(f"Horário de execução do aporte ({intraday['intervalo']})")
+    if intraday.get("falhas"):
+        st.warning(
+            f"{intraday['falhas']} de {intraday['blocos']} blocos de dados intraday não foram entregues pela fonte. "
+            "A média abaixo cobre só os períodos recebidos (janela com lacunas)."
+        )
+    if tabela_intraday.empty:
+        st.info("Sem barras intraday na janela escolhida (a fonte só mantém um histórico recente).")
+    else:
+        fig_h = go.Figure(
+            go.Bar(
+                x=tabela_intraday.index,
+                y=tabela_intraday["cotas_vs_fechamento_pct"],
+                customdata=tabela_intraday[["dias", "desvio_pct"]],
+                hovertemplate="%{x}: %{y:.2f}%<br>dias: %{customdata[0]} | desvio: %{customdata[1]:.2f}%<extra></extra>",
+                marker_color="#1f77b4",
+            )
+        )
+        fig_h.update_layout(
+            template="plotly_white",
+            yaxis=dict(ticksuffix="%", tickformat=".2f", title="Cotas a mais vs. fechamento"),
+            xaxis=dict(title="Horário de início da barra"),
+            margin=dict(l=10, r=10, t=20, b=10),
+        )
+        st.plotly_chart(fig_h, use_container_width=True)
+        st.caption(
+            "Valor positivo = comprar na abertura da barra daquele horário (preço de abertura da barra) "
+            "rendeu, em média, mais cotas do que comprar no fechamento do mesmo dia (fechamento do último "
+            f"candle). Média sobre os pregões da janela intraday ({intraday.get('blocos', 0) - intraday.get('falhas', 0)} "
+            f"de {intraday.get('blocos', 0)} blocos recebidos)."
+        )
+
+# -------------------------
+# EXPORTAÇÃO
+# -------------------------
+with st.expander("⬇️ Exportar dados (CSV/Parquet)"):
+    formato_export = st.radio("Formato", ["CSV", "Parquet"], horizontal=True, key="formato_export")
+    ext_export = "parquet" if formato_export == "Parquet" else "csv"
+    mime_export = "application/octet-stream" if formato_export == "Parquet" else "text/csv"
+
+    # Os arquivos só são montados sob demanda; valem enquanto a simulação/visões não mudarem.
+    chave_export = (params["ticker"], valor_aporte_exec, data_inicio_exec, data_fim_exec,
+                    mostrar_rf, mostrar_ipca, mostrar_ibov, mostrar_usd, formato_export)
+    if st.button("Gerar arquivos", key="gerar_export"):
+        limpar_arquivos_antigos()
+        with st.spinner("Gerando arquivos..."):
+            base_diaria = montar_base_diaria(
+                df_acao, s_rf, s_ipca, s_ibov, dt_ini_user, dt_fim_user, s_fx=s_fx, s_sp500=s_sp500
+            )
+            st.session_state["export_arquivos"] = {
+                "chave": chave_export,
+                "base": exportar_para_arquivo(base_diaria, formato_export, f"{ticker_exec}_base_diaria"),
+                "horizontes": exportar_para_arquivo(
+                    pd.DataFrame(resultados_horizonte), formato_export, f"{ticker_exec}_horizontes", index=False
+                ),
+            }
+            del base_diaria
+
+    arquivos_export = st.session_state.get("export_arquivos")
+    if (
+        arquivos_export
+        and arquivos_export["chave"] == chave_export
+        and all(os.path.exists(arquivos_export[k]) for k in ("base", "horizontes"))
+    ):
+        col_exp1, col_exp2 = st.columns(2)
+        with col_exp1:
+            st.download_button(
+                "Base diária (ativo + benchmarks)",
+                data=leitor_arquivo(arquivos_export["base"]),
+                file_name=f"{ticker_exec}_base_diaria.{ext_export}",
+                mime=mime_export,
+            )
+        with col_exp2:
+            st.download_button(
+                "Resultados por horizonte",
+                data=leitor_arquivo(arquivos_export["horizontes"]),
+                file_name=f"{ticker_exec}_horizontes.{ext_export}",
+                mime=mime_export,
+                disabled=not resultados_horizonte,
+            )
+
 st.markdown(
     """
 <div class="glossario-container">
@@ -733,6 +1587,9 @@ st.markdown(
 <span class="glossario-termo">• Ibovespa</span>
 <span class="glossario-def">Principal índice da bolsa brasileira, usado como referência de desempenho do mercado.</span>
 
+<span class="glossario-termo">• Visão em Dólar (US$) / S&amp;P 500 TR</span>
+<span class="glossario-def">Cada aporte em reais é convertido pela cotação do dólar (<b>PTAX</b> do BCB; se indisponível, Yahoo) da <b>própria data do aporte</b>. O S&amp;P 500 Total Return mostra quanto os mesmos dólares teriam rendido na bolsa americana com dividendos reinvestidos.</span>
+
 <span class="glossario-termo">• Capital Nominal Investido</span>
 <span class="glossario-def">Somatório bruto de todos os aportes mensais, sem considerar juros, inflação ou retornos.</span>
 
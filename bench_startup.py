@@ -0,0 +1,76 @@
+"""
+Benchmark de cold start do app (tempo até a primeira pintura da tela de boas-vindas).
+
+Cada rodada sobe um processo Python novo (como um pod recém-criado) e mede:
+- import: tempo para importar streamlit/pandas/numpy (base inevitável);
+- primeira execução: tempo do 1º run do script via streamlit.testing (AppTest),
+  que é o que o usuário espera até ver a tela de boas-vindas;
+- quais módulos pesados (yfinance, plotly) foram carregados nesse 1º run.
+
+Uso:
+    python bench_startup.py [--rodadas 5] [--app caminho/app.py]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+_RODADA = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import streamlit, pandas, numpy
+t1 = time.perf_counter()
+base = {m for m in ("yfinance", "plotly") if m in sys.modules}
+from streamlit.testing.v1 import AppTest  # só instrumentação: fora das medições
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+t2 = time.perf_counter()
+at.run()
+t3 = time.perf_counter()
+print(json.dumps({
+    "import_s": t1 - t0,
+    "primeira_execucao_s": t3 - t2,
+    "erros": [str(e.value) for e in at.exception],
+    "yfinance": "yfinance" in sys.modules,
+    "plotly": "plotly" in sys.modules,
+    "ja_importados_pelo_streamlit": sorted(base),
+}))
+"""
+
+def rodar_uma_vez(app: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", _RODADA, app],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rodadas", type=int, default=5)
+    parser.add_argument("--app", default=APP, help="script a medir (ex.: uma versão anterior do app)")
+    args = parser.parse_args()
+
+    resultados = [rodar_uma_vez(args.app) for _ in range(args.rodadas)]
+    for r in resultados:
+        if r["erros"]:
+            print(f"⚠️ exceção no app: {r['erros']}")
+
+    imp = [r["import_s"] for r in resultados]
+    run = [r["primeira_execucao_s"] for r in resultados]
+    print(f"rodadas: {args.rodadas}")
+    print(f"import base (streamlit/pandas/numpy): mediana {statistics.median(imp) * 1000:.0f} ms")
+    print(f"primeira execução até boas-vindas:    mediana {statistics.median(run) * 1000:.0f} ms")
+    print(f"total até primeira pintura:           mediana {statistics.median(a + b for a, b in zip(imp, run)) * 1000:.0f} ms")
+    base = sorted({m for r in resultados for m in r["ja_importados_pelo_streamlit"]})
+    print(f"yfinance carregado no 1º run: {any(r['yfinance'] for r in resultados)}")
+    print(f"plotly carregado no 1º run:   {any(r['plotly'] for r in resultados)}")
+    if base:
+        print(f"(já importados pelo próprio streamlit, antes do app: {', '.join(base)})")
+
+if __name__ == "__main__":
+    main()